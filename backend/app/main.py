@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import pdf, estimate
+from app.routers import pdf, estimate, history, admin
 import logging
 from loguru import logger
 
@@ -30,6 +30,8 @@ app.add_middleware(
 # Include routers
 app.include_router(pdf.router, prefix="/api", tags=["pdf"])
 app.include_router(estimate.router, prefix="/api", tags=["estimate"])
+app.include_router(history.router, prefix="/api", tags=["history"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
 
 @app.get("/")
 async def root():
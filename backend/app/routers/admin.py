@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from ..services.profiler import request_profiler
+from ..services.single_flight import single_flights
+
+router = APIRouter()
+
+def require_admin(request: Request) -> None:
+    """Reject requests that do not carry the profiler admin token."""
+    if not request_profiler.is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """List the retained request profiles, newest first."""
+    require_admin(request)
+    return {"profiles": request_profiler.list_profiles()}
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str, output_format: str = Query("pstats", alias="format")):
+    """Download a profile as a pstats file, or as a text summary with format=text."""
+    require_admin(request)
+    if output_format == "text":
+        summary = request_profiler.format_stats(profile_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return PlainTextResponse(summary)
+
+    stats = request_profiler.get_stats(profile_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(
+        content=stats,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+    )
+
+@router.get("/admin/single-flight")
+async def single_flight_stats():
+    """
+    Report how many calls each single-flight group executed and coalesced.
+
+    The counters hold no job data, so unlike profiles they need no admin token.
+    """
+    return {name: flight.stats() for name, flight in single_flights.items()}
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from io import BytesIO
+import hashlib
+import json
 import math
+from loguru import logger
+from ..services.history_store import history_store
+from ..services.profiler import request_profiler, PROFILE_ID_HEADER
+from ..services.single_flight import SingleFlight
 
 router = APIRouter()
+estimate_flight = SingleFlight("generate-estimate")
 
 class MaterialCost(BaseModel):
     shingles: float
@@ -58,8 +65,25 @@ class EstimateRequest(BaseModel):
     costs: EstimateCosts
 
 @router.post("/generate-estimate")
-async def generate_estimate(request: EstimateRequest) -> bytes:
+async def generate_estimate(request: EstimateRequest, http_request: Request, response: Response) -> bytes:
     """Generate a PDF estimate based on measurements and pricing."""
+    # Identical concurrent requests share a single build
+    payload = json.dumps(request.model_dump(), sort_keys=True, default=str)
+    key = hashlib.sha256(payload.encode()).hexdigest()
+    (pdf_bytes, profile_id), shared = await estimate_flight.do_shared(key, run_estimate, request, http_request)
+    # The profile belongs to the request that ran the build
+    if profile_id and not shared:
+        response.headers[PROFILE_ID_HEADER] = profile_id
+    return pdf_bytes
+
+def run_estimate(request: EstimateRequest, http_request: Request) -> Tuple[bytes, Optional[str]]:
+    """Build the estimate PDF, returning it with the profile ID, if any."""
+    with request_profiler.profile(http_request, "generate_estimate") as profile:
+        pdf_bytes = build_estimate_pdf(request)
+    return pdf_bytes, profile.profile_id
+
+def build_estimate_pdf(request: EstimateRequest) -> bytes:
+    """Build the estimate PDF and record it in the job history."""
     try:
         # Create PDF buffer
         buffer = BytesIO()
@@ -252,7 +276,14 @@ async def generate_estimate(request: EstimateRequest) -> bytes:
         # Build PDF
         doc.build(content)
         buffer.seek(0)
-        return buffer.getvalue()
+        pdf_bytes = buffer.getvalue()
+
+        try:
+            history_store.save_estimate(request.model_dump(), pdf_bytes)
+        except Exception as e:
+            logger.warning(f"Could not store estimate history: {e}")
+
+        return pdf_bytes
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Optional
+from ..services.history_store import history_store, MAX_PAGE_SIZE
+from ..services.response_encoding import negotiated_response
+
+# Handlers are plain functions so FastAPI runs the blocking SQLite calls in its threadpool
+router = APIRouter()
+
+@router.get("/history/extractions")
+def list_extractions(
+    request: Request,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    job_address: Optional[str] = None,
+    report_id: Optional[str] = None,
+    pdf_hash: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """List past extractions, newest first, using keyset pagination."""
+    try:
+        page = history_store.list_extractions(
+            limit=limit,
+            cursor=cursor,
+            job_address=job_address,
+            report_id=report_id,
+            pdf_hash=pdf_hash,
+            since=since,
+            until=until,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return negotiated_response(request, page)
+
+@router.get("/history/extractions/{pdf_hash}")
+def get_extraction(request: Request, pdf_hash: str):
+    """Get the stored extraction for a PDF hash."""
+    extraction = history_store.get_extraction(pdf_hash)
+    if not extraction:
+        raise HTTPException(status_code=404, detail="Extraction not found")
+    return negotiated_response(request, extraction)
+
+@router.get("/history/estimates")
+def list_estimates(
+    request: Request,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    job_address: Optional[str] = None,
+    report_id: Optional[str] = None,
+    pdf_hash: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """List past estimates, newest first, using keyset pagination."""
+    try:
+        page = history_store.list_estimates(
+            limit=limit,
+            cursor=cursor,
+            job_address=job_address,
+            report_id=report_id,
+            pdf_hash=pdf_hash,
+            since=since,
+            until=until,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return negotiated_response(request, page)
+
+@router.get("/history/estimates/{estimate_id}")
+def get_estimate(request: Request, estimate_id: int):
+    """Get a stored estimate request and its metadata."""
+    estimate = history_store.get_estimate(estimate_id)
+    if not estimate:
+        raise HTTPException(status_code=404, detail="Estimate not found")
+    return negotiated_response(request, estimate)
+
+@router.get("/history/estimates/{estimate_id}/pdf")
+def get_estimate_pdf(estimate_id: int):
+    """Download the generated PDF stored for an estimate."""
+    output = history_store.get_estimate_output(estimate_id)
+    if not output:
+        raise HTTPException(status_code=404, detail="Estimate PDF not found")
+    return Response(
+        content=output,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="estimate-{estimate_id}.pdf"'},
+    )
@@ -1,14 +1,40 @@
-from fastapi import APIRouter, UploadFile, HTTPException, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, HTTPException, File, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from loguru import logger
-from ..services.pdf_extractor import PDFExtractor
+from ..services.pdf_extractor import PDFExtractor, extraction_executor
+from ..services.history_store import history_store, compute_pdf_hash
+from ..services.response_encoding import negotiated_response
+from ..services.thumbnail_service import thumbnail_service
+from ..services.profiler import request_profiler, PROFILE_ID_HEADER
+from ..services.single_flight import SingleFlight
+import asyncio
+import json
+import threading
 import traceback
+from typing import Dict, Any, AsyncIterator, Iterator, Optional, Tuple
 
 router = APIRouter()
 pdf_extractor = PDFExtractor()
+extraction_flight = SingleFlight("process-pdf", extraction_executor)
+# Reports evicted from the thumbnail cache need the PDF again before their pages can be shown
+EVICTED_DETAIL = "PDF not found; re-upload it to view its diagrams"
+
+def run_extraction(request: Request, contents: bytes, pdf_hash: str, filename: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Extract measurements and store them in the history; returns them with the profile ID, if any."""
+    with request_profiler.profile(request, "extract_measurements") as profile:
+        response_data = pdf_extractor.extract_measurements(contents)
+    if response_data:
+        response_data['pdf_hash'] = pdf_hash
+        logger.info(f"Extracted {len(response_data)} measurement fields from PDF {pdf_hash}")
+        logger.debug(f"Extracted measurements: {response_data}")
+        try:
+            history_store.save_extraction(pdf_hash, filename, response_data, PDFExtractor.VERSION)
+        except Exception as e:
+            logger.warning(f"Could not store extraction history: {e}")
+    return response_data, profile.profile_id
 
 @router.post("/process-pdf")
-async def process_pdf(file: UploadFile = File(...)):
+async def process_pdf(request: Request, file: UploadFile = File(...), refresh: bool = Query(False)):
     """Process uploaded PDF and extract measurements."""
     # Get original filename, fallback to uploaded filename if not present
     filename = getattr(file, 'filename', None) or file.filename
@@ -17,7 +43,8 @@ async def process_pdf(file: UploadFile = File(...)):
     # Check if filename exists and has an extension
     if not filename or '.' not in filename:
         logger.error(f"Invalid filename: {filename}")
-        return JSONResponse(
+        return negotiated_response(
+            request,
             status_code=400,
             content={"error": "Invalid file: Missing filename or extension"}
         )
@@ -26,7 +53,8 @@ async def process_pdf(file: UploadFile = File(...)):
     file_extension = filename.lower().split('.')[-1]
     if file_extension != 'pdf':
         logger.error(f"Invalid file type: {file_extension}")
-        return JSONResponse(
+        return negotiated_response(
+            request,
             status_code=400,
             content={"error": f"File must be a PDF, got {file_extension}"}
         )
@@ -35,29 +63,224 @@ async def process_pdf(file: UploadFile = File(...)):
         contents = await file.read()
         if not contents:
             logger.error("Empty file received")
-            return JSONResponse(
+            return negotiated_response(
+                request,
                 status_code=400,
                 content={"error": "Empty file"}
             )
-            
-        response_data = pdf_extractor.extract_measurements(contents)
+
+        pdf_hash = compute_pdf_hash(contents)
+        try:
+            # Writing the copy may also evict old reports, so keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, thumbnail_service.store_source, pdf_hash, contents
+            )
+        except Exception as e:
+            logger.warning(f"Could not store PDF for thumbnails: {e}")
+
+        # Reuse a previous extraction of the same PDF unless a refresh is requested or the extractor changed
+        if not refresh:
+            # SQLite may wait on a write lock, so keep the lookup off the event loop
+            stored = await asyncio.get_running_loop().run_in_executor(
+                None, history_store.get_extraction, pdf_hash, PDFExtractor.VERSION
+            )
+            if stored:
+                logger.info(f"Returning stored measurements for PDF {pdf_hash}")
+                return negotiated_response(request, stored['measurements'])
+
+        # Concurrent uploads of the same PDF share a single extraction
+        (response_data, profile_id), shared = await extraction_flight.do_shared(
+            pdf_hash, run_extraction, request, contents, pdf_hash, filename
+        )
         if not response_data:
             logger.error("No measurements extracted from PDF")
-            return JSONResponse(
+            return negotiated_response(
+                request,
                 status_code=400,
                 content={"error": "Could not extract measurements from PDF"}
             )
-            
-        logger.info(f"Extracted measurements: {response_data}")
-        return JSONResponse(content=response_data)
+
+        response = negotiated_response(request, response_data)
+        # The profile belongs to the request that ran the extraction
+        if profile_id and not shared:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
     
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error processing PDF: {error_msg}")
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return JSONResponse(
+        return negotiated_response(
+            request,
             status_code=500,
             content={"error": f"Failed to process PDF: {error_msg}"}
         )
     finally:
-        await file.close() 
\ No newline at end of file
+        await file.close()
+
+def format_event(event: Dict[str, Any], sse: bool) -> str:
+    """Serialize a progress event as a server-sent event or an NDJSON line."""
+    data = json.dumps(event)
+    if sse:
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+def extraction_events(contents: bytes, pdf_hash: str, filename: str, refresh: bool) -> Iterator[Dict[str, Any]]:
+    """Run extraction and yield its progress events, storing the final result in the history."""
+    try:
+        if not refresh:
+            stored = history_store.get_extraction(pdf_hash, PDFExtractor.VERSION)
+            if stored:
+                logger.info(f"Returning stored measurements for PDF {pdf_hash}")
+                yield {'event': 'complete', 'measurements': stored['measurements']}
+                return
+
+        for event in pdf_extractor.iter_extraction_events(contents):
+            if event['event'] == 'complete':
+                measurements = event['measurements']
+                measurements['pdf_hash'] = pdf_hash
+                logger.info(f"Extracted {len(measurements)} measurement fields from PDF {pdf_hash}")
+                try:
+                    history_store.save_extraction(pdf_hash, filename, measurements, PDFExtractor.VERSION)
+                except Exception as e:
+                    logger.warning(f"Could not store extraction history: {e}")
+            yield event
+
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Error processing PDF: {error_msg}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        yield {'event': 'error', 'error': f"Failed to process PDF: {error_msg}"}
+
+async def stream_extraction(contents: bytes, pdf_hash: str, filename: str, refresh: bool, sse: bool) -> AsyncIterator[str]:
+    """
+    Stream extraction events as they are produced.
+
+    The whole generator runs inside one job on the extraction worker, so the
+    PyMuPDF document is only ever touched from that thread. Events come back
+    through a queue.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def send(event: Optional[Dict[str, Any]]) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            # The event loop has shut down
+            cancelled.set()
+
+    def produce() -> None:
+        events = extraction_events(contents, pdf_hash, filename, refresh)
+        try:
+            for event in events:
+                if cancelled.is_set():
+                    break
+                send(event)
+        finally:
+            # Close on the worker thread so the document is released there too
+            events.close()
+            send(None)
+
+    loop.run_in_executor(extraction_executor, produce)
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield format_event(event, sse)
+    finally:
+        # Stop extracting if the client goes away
+        cancelled.set()
+
+@router.post("/process-pdf/stream")
+async def process_pdf_stream(request: Request, file: UploadFile = File(...), refresh: bool = Query(False)):
+    """
+    Process uploaded PDF and stream extraction progress.
+
+    Sends server-sent events when the client accepts text/event-stream and
+    NDJSON otherwise. Partial measurements are emitted as each field is
+    found, followed by a final ``complete`` event with the full result.
+    """
+    filename = file.filename
+    logger.info(f"Received file for streaming: {filename}")
+
+    if not filename or '.' not in filename:
+        logger.error(f"Invalid filename: {filename}")
+        return negotiated_response(
+            request,
+            status_code=400,
+            content={"error": "Invalid file: Missing filename or extension"}
+        )
+
+    file_extension = filename.lower().split('.')[-1]
+    if file_extension != 'pdf':
+        logger.error(f"Invalid file type: {file_extension}")
+        return negotiated_response(
+            request,
+            status_code=400,
+            content={"error": f"File must be a PDF, got {file_extension}"}
+        )
+
+    try:
+        contents = await file.read()
+    finally:
+        await file.close()
+    if not contents:
+        logger.error("Empty file received")
+        return negotiated_response(
+            request,
+            status_code=400,
+            content={"error": "Empty file"}
+        )
+
+    pdf_hash = compute_pdf_hash(contents)
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            None, thumbnail_service.store_source, pdf_hash, contents
+        )
+    except Exception as e:
+        logger.warning(f"Could not store PDF for thumbnails: {e}")
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        stream_extraction(contents, pdf_hash, filename, refresh, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/pdf/{pdf_hash}/diagrams")
+async def list_diagrams(request: Request, pdf_hash: str):
+    """
+    List the roof diagram and image pages of a previously uploaded PDF.
+
+    Reports evicted from the thumbnail cache return 404 until the PDF is uploaded again.
+    """
+    try:
+        pages = await thumbnail_service.get_diagram_pages(pdf_hash)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=EVICTED_DETAIL)
+
+    for page in pages:
+        page['thumbnail_url'] = f"/api/pdf/{pdf_hash}/pages/{page['page']}/thumbnail"
+    return negotiated_response(request, {"pdf_hash": pdf_hash, "pages": pages})
+
+@router.get("/pdf/{pdf_hash}/pages/{page}/thumbnail")
+async def get_thumbnail(pdf_hash: str, page: int, size: int = Query(400)):
+    """Serve a cached JPEG thumbnail of a PDF page, rendering it on first request."""
+    try:
+        path = await thumbnail_service.get_thumbnail(pdf_hash, page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=EVICTED_DETAIL)
+
+    # Thumbnails are keyed by content hash, so they never change
+    return FileResponse(
+        path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
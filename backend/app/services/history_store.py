@@ -0,0 +1,289 @@
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from loguru import logger
+
+DEFAULT_DB_PATH = os.getenv("HISTORY_DB_PATH", "data/history.db")
+MAX_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_hash TEXT NOT NULL UNIQUE,
+    filename TEXT,
+    report_id TEXT,
+    job_address TEXT,
+    job_address_key TEXT,
+    created_at TEXT NOT NULL,
+    measurements TEXT NOT NULL,
+    extractor_version INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_extractions_report_id ON extractions (report_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_extractions_job_address ON extractions (job_address_key, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_extractions_created_at ON extractions (created_at, id);
+
+CREATE TABLE IF NOT EXISTS estimates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_hash TEXT,
+    report_id TEXT,
+    job_address TEXT,
+    job_address_key TEXT,
+    created_at TEXT NOT NULL,
+    request TEXT NOT NULL,
+    output BLOB
+);
+CREATE INDEX IF NOT EXISTS ix_estimates_pdf_hash ON estimates (pdf_hash, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_estimates_report_id ON estimates (report_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_estimates_job_address ON estimates (job_address_key, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_estimates_created_at ON estimates (created_at, id);
+"""
+
+
+def compute_pdf_hash(pdf_contents: bytes) -> str:
+    """Return the SHA-256 hex digest used to identify a PDF."""
+    return hashlib.sha256(pdf_contents).hexdigest()
+
+
+def _address_key(address: Optional[str]) -> Optional[str]:
+    """Normalize an address so prefix searches can use the index."""
+    if not address:
+        return None
+    return " ".join(address.lower().split())
+
+
+def _normalize_timestamp(value: str) -> str:
+    """Parse an ISO 8601 timestamp and return it in the UTC format stored in created_at."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _encode_cursor(created_at: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{row_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class HistoryStore:
+    """SQLite-backed store of past extractions and generated estimates."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH) -> None:
+        """Create the database file and schema if they do not exist."""
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Databases created before extractor versioning lack the column
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(extractions)")}
+            if 'extractor_version' not in columns:
+                conn.execute("ALTER TABLE extractions ADD COLUMN extractor_version INTEGER")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save_extraction(
+        self, pdf_hash: str, filename: Optional[str], measurements: Dict[str, Any], extractor_version: int
+    ) -> None:
+        """Store (or replace) the extraction result for a PDF.
+
+        Replacing a result also resets ``created_at``, which is what listings sort
+        and filter by, so a re-extracted PDF shows up as the newest entry.
+        """
+        job_address = measurements.get('job_address')
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO extractions
+                    (pdf_hash, filename, report_id, job_address, job_address_key, created_at, measurements,
+                     extractor_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(pdf_hash) DO UPDATE SET
+                    filename = excluded.filename,
+                    report_id = excluded.report_id,
+                    job_address = excluded.job_address,
+                    job_address_key = excluded.job_address_key,
+                    measurements = excluded.measurements,
+                    extractor_version = excluded.extractor_version,
+                    created_at = excluded.created_at
+                """,
+                (
+                    pdf_hash,
+                    filename,
+                    measurements.get('report_id'),
+                    job_address,
+                    _address_key(job_address),
+                    datetime.now(timezone.utc).isoformat(),
+                    json.dumps(measurements),
+                    extractor_version,
+                ),
+            )
+        logger.debug(f"Stored extraction for PDF {pdf_hash}")
+
+    def get_extraction(self, pdf_hash: str, extractor_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Return the stored extraction for a PDF hash, if any.
+
+        When ``extractor_version`` is given, results stored by another version are treated as missing.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM extractions WHERE pdf_hash = ?", (pdf_hash,)).fetchone()
+        if not row or (extractor_version is not None and row['extractor_version'] != extractor_version):
+            return None
+        return self._extraction_row(row)
+
+    def save_estimate(self, request: Dict[str, Any], output: Optional[bytes] = None) -> int:
+        """Store an estimate request and its generated document; returns the estimate ID."""
+        measurements = request.get('measurements') or {}
+        job_address = measurements.get('job_address')
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO estimates
+                    (pdf_hash, report_id, job_address, job_address_key, created_at, request, output)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    measurements.get('pdf_hash'),
+                    measurements.get('report_id'),
+                    job_address,
+                    _address_key(job_address),
+                    datetime.now(timezone.utc).isoformat(),
+                    json.dumps(request),
+                    output,
+                ),
+            )
+            estimate_id = cursor.lastrowid
+        logger.debug(f"Stored estimate {estimate_id}")
+        return estimate_id
+
+    def get_estimate(self, estimate_id: int) -> Optional[Dict[str, Any]]:
+        """Return the stored estimate request and metadata, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, pdf_hash, report_id, job_address, created_at, request, length(output) AS output_size "
+                "FROM estimates WHERE id = ?",
+                (estimate_id,),
+            ).fetchone()
+        return self._estimate_row(row) if row else None
+
+    def get_estimate_output(self, estimate_id: int) -> Optional[bytes]:
+        """Return the generated document stored for an estimate, if any."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT output FROM estimates WHERE id = ?", (estimate_id,)).fetchone()
+        return row['output'] if row else None
+
+    def list_extractions(self, limit: int = 20, cursor: Optional[str] = None, **filters: Any) -> Dict[str, Any]:
+        """Return a page of extractions, newest first."""
+        columns = "id, pdf_hash, filename, report_id, job_address, created_at, measurements, extractor_version"
+        rows, next_cursor = self._page("extractions", columns, limit, cursor, **filters)
+        return {"items": [self._extraction_row(row) for row in rows], "next_cursor": next_cursor}
+
+    def list_estimates(self, limit: int = 20, cursor: Optional[str] = None, **filters: Any) -> Dict[str, Any]:
+        """Return a page of estimates, newest first."""
+        columns = "id, pdf_hash, report_id, job_address, created_at, request, length(output) AS output_size"
+        rows, next_cursor = self._page("estimates", columns, limit, cursor, **filters)
+        return {"items": [self._estimate_row(row) for row in rows], "next_cursor": next_cursor}
+
+    def _page(
+        self,
+        table: str,
+        columns: str,
+        limit: int,
+        cursor: Optional[str],
+        pdf_hash: Optional[str] = None,
+        report_id: Optional[str] = None,
+        job_address: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """Run a keyset-paginated query ordered by (created_at, id) descending."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses: List[str] = []
+        params: List[Any] = []
+
+        if pdf_hash:
+            clauses.append("pdf_hash = ?")
+            params.append(pdf_hash)
+        if report_id:
+            clauses.append("report_id = ?")
+            params.append(report_id)
+        if job_address:
+            # Prefix match expressed as a range so SQLite can seek the index
+            key = _address_key(job_address)
+            clauses.append("job_address_key >= ? AND job_address_key < ?")
+            params.extend([key, key + "\uffff"])
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(_normalize_timestamp(since))
+        if until:
+            clauses.append("created_at < ?")
+            params.append(_normalize_timestamp(until))
+        if cursor:
+            created_at, row_id = _decode_cursor(cursor)
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, row_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT {columns} FROM {table} {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return rows, next_cursor
+
+    @staticmethod
+    def _extraction_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row['id'],
+            "pdf_hash": row['pdf_hash'],
+            "filename": row['filename'],
+            "report_id": row['report_id'],
+            "job_address": row['job_address'],
+            "created_at": row['created_at'],
+            "measurements": json.loads(row['measurements']),
+            "extractor_version": row['extractor_version'],
+        }
+
+    @staticmethod
+    def _estimate_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row['id'],
+            "pdf_hash": row['pdf_hash'],
+            "report_id": row['report_id'],
+            "job_address": row['job_address'],
+            "created_at": row['created_at'],
+            "request": json.loads(row['request']),
+            "output_size": row['output_size'],
+        }
+
+
+history_store = HistoryStore()
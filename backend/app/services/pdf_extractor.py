@@ -1,14 +1,24 @@
 import re
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 import fitz  # pymupdf
 from loguru import logger
 from io import BytesIO
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# PyMuPDF is not thread-safe, so all extraction work runs on this single worker thread
+extraction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-extraction")
 
 class PDFExtractor:
     """Class to extract measurements from EagleView PDF reports."""
 
+    # Bump whenever extraction output changes so stored results are recomputed
+    VERSION = 1
+
+    # Characters of the previous page rescanned when matching patterns page by page
+    PAGE_OVERLAP = 500
+
     def __init__(self) -> None:
         """Initialize PDFExtractor with compiled regex patterns."""
         # Pre-compile regular expressions for better performance
@@ -26,6 +36,11 @@ class PDFExtractor:
             'penetrations_perimeter': re.compile(r'Total\s+Penetrations\s+Perimeter\s*=\s*(\d+)\s*ft', re.IGNORECASE),
             'suggested_waste': re.compile(r'(?P<waste_percentage>\d+)%\s*\n\s*(?P<area_sq_ft>\d+)\s*\n\s*(?P<suggested_squares>\d+\.\d+)', re.IGNORECASE | re.DOTALL)
         }
+        # Report identification fields, kept as strings and used to index job history
+        self.report_patterns: Dict[str, re.Pattern] = {
+            'report_id': re.compile(r'Report[ \t]*(?:(?:#|ID|Number)[ \t]*:?|:)[ \t]*(\d{6,})', re.IGNORECASE),
+            'job_address': re.compile(r'^(\d+[ \t]+[^\n,]+(?:,[ \t]*|\n)[^\n,]+,[ \t]*[A-Z]{2}[ \t]+\d{5}(?:-\d{4})?)', re.MULTILINE),
+        }
 
     def find_measurement_with_count(self, text: str, key: str, length: float) -> Optional[int]:
         """
@@ -178,6 +193,17 @@ class PDFExtractor:
         
         return text
 
+    def extract_report_details(self, text: str) -> Dict[str, str]:
+        """Extract the report ID and job address from text."""
+        details = {}
+        for key, pattern in self.report_patterns.items():
+            match = pattern.search(text)
+            if match:
+                details[key] = ' '.join(match.group(1).split())
+            else:
+                logger.warning(f"No match found for {key}")
+        return details
+
     def extract_ridges_and_hips(self, text: str) -> tuple[float, float]:
         """Extract ridges and hips lengths from text, handling combined measurements."""
         # Try to find separate ridge and hip measurements in the full text first
@@ -209,8 +235,39 @@ class PDFExtractor:
         logger.debug(f"No measurements found, returning ridges: {ridges}, hips: {hips}")
         return ridges, hips
 
+    def parse_match(self, key: str, match: re.Match) -> Dict[str, Any]:
+        """Convert a pattern match into measurement fields."""
+        if key == 'suggested_waste':
+            # Handle waste calculation differently
+            return {'waste_percentage': int(match.group('waste_percentage'))}
+        if key == 'predominant_pitch':
+            # Keep pitch as a string
+            return {key: match.group(1)}
+        # Remove commas and convert to float
+        value = match.group(1).replace(',', '')
+        try:
+            return {key: float(value)}
+        except ValueError:
+            logger.warning(f"Could not convert {key} value '{value}' to float")
+            return {key: 0}
+
     def extract_measurements(self, pdf_contents: bytes) -> Dict[str, Any]:
         """Extract measurements from PDF contents."""
+        measurements: Dict[str, Any] = {}
+        for event in self.iter_extraction_events(pdf_contents):
+            if event['event'] == 'complete':
+                measurements = event['measurements']
+        return measurements
+
+    def iter_extraction_events(self, pdf_contents: bytes) -> Iterator[Dict[str, Any]]:
+        """
+        Extract measurements from PDF contents, yielding progress as it goes.
+
+        Yields an ``opened`` event, a ``page`` event per scanned page, a ``field``
+        event with the partial measurements whenever a pattern first matches, and
+        finally a ``complete`` event with the full result. Partial values are
+        previews; the ``complete`` measurements are computed from the whole text.
+        """
         try:
             # Create PDF document from bytes
             pdf_document = fitz.open(stream=pdf_contents, filetype="pdf")
@@ -219,10 +276,27 @@ class PDFExtractor:
                 logger.error("PDF document has no pages")
                 raise ValueError("Invalid PDF: Document has no pages")
 
-            # Extract text from all pages
+            yield {'event': 'opened', 'page_count': pdf_document.page_count}
+
+            # Extract text from all pages, matching patterns as soon as they appear
             text = ""
+            partial: Dict[str, Any] = {}
+            pending = dict(self.patterns)
             for page in pdf_document:
+                # Only rescan the new page plus enough overlap for matches spanning the boundary
+                search_start = max(0, len(text) - self.PAGE_OVERLAP)
                 text += page.get_text()
+                yield {'event': 'page', 'page': page.number + 1, 'page_count': pdf_document.page_count}
+
+                for key, pattern in list(pending.items()):
+                    match = pattern.search(text, search_start)
+                    # A match touching the end of the text may still grow on the next page
+                    if match and match.end() < len(text):
+                        del pending[key]
+                        fields = self.parse_match(key, match)
+                        partial.update(fields)
+                        for field, value in fields.items():
+                            yield {'event': 'field', 'field': field, 'value': value, 'measurements': dict(partial)}
             
             if not text:
                 logger.error("No text extracted from PDF")
@@ -237,20 +311,7 @@ class PDFExtractor:
             for key, pattern in self.patterns.items():
                 match = pattern.search(text)
                 if match:
-                    if key == 'suggested_waste':
-                        # Handle waste calculation differently
-                        measurements['waste_percentage'] = int(match.group('waste_percentage'))
-                    elif key == 'predominant_pitch':
-                        # Keep pitch as a string
-                        measurements[key] = match.group(1)
-                    else:
-                        # Remove commas and convert to float
-                        value = match.group(1).replace(',', '')
-                        try:
-                            measurements[key] = float(value)
-                        except ValueError:
-                            logger.warning(f"Could not convert {key} value '{value}' to float")
-                            measurements[key] = 0
+                    measurements.update(self.parse_match(key, match))
                 else:
                     logger.warning(f"No match found for {key}")
                     # Set default values for required fields
@@ -268,12 +329,15 @@ class PDFExtractor:
             measurements['ridges'] = ridges
             measurements['hips'] = hips
 
+            # Extract report ID and job address
+            measurements.update(self.extract_report_details(text))
+
             # Set default waste percentage if not found
             if 'waste_percentage' not in measurements:
                 measurements['waste_percentage'] = 12
 
             logger.info(f"Final measurements: {measurements}")
-            return measurements
+            yield {'event': 'complete', 'measurements': measurements}
 
         except Exception as e:
             logger.error(f"Error extracting measurements: {str(e)}")
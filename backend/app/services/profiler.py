@@ -0,0 +1,157 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterator
+from fastapi import Request
+from loguru import logger
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-ID"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+REQUEST_ID_PATTERN = re.compile(r'^[\w-]{1,64}$')
+
+
+class ProfileHandle:
+    """Identifies the profile recorded for a request, if any."""
+
+    def __init__(self, profile_id: Optional[str] = None) -> None:
+        self.profile_id = profile_id
+
+
+class RequestProfiler:
+    """Opt-in cProfile sampling of request handlers with bounded in-memory retention."""
+
+    def __init__(
+        self,
+        sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        max_profiles: int = int(os.getenv("PROFILE_MAX_ENTRIES", "50")),
+        admin_token: Optional[str] = os.getenv("PROFILER_ADMIN_TOKEN"),
+    ) -> None:
+        """Configure sampling; profiling is off unless an admin token is set to download the results."""
+        if sample_rate and not admin_token:
+            logger.warning("PROFILE_SAMPLE_RATE is ignored because PROFILER_ADMIN_TOKEN is not set")
+            sample_rate = 0
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        self.admin_token = admin_token
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_admin(self, request: Request) -> bool:
+        """Check the request carries the configured admin token."""
+        return bool(self.admin_token) and request.headers.get(ADMIN_TOKEN_HEADER) == self.admin_token
+
+    def should_profile(self, request: Request) -> bool:
+        """Decide whether to profile a request, by explicit header or random sampling."""
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return request.headers.get(PROFILE_HEADER) == "1" and self.is_admin(request)
+
+    @contextmanager
+    def profile(self, request: Request, label: str) -> Iterator[ProfileHandle]:
+        """Run the enclosed block under cProfile when the request is selected for profiling."""
+        handle = ProfileHandle()
+        if not self.should_profile(request):
+            yield handle
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            started = True
+        except ValueError as e:
+            # Another profiler is already active in this process
+            logger.warning(f"Could not start profiler for {label}: {e}")
+            started = False
+        if not started:
+            yield handle
+            return
+
+        started_at = time.perf_counter()
+        try:
+            yield handle
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started_at
+            handle.profile_id = uuid.uuid4().hex
+            request_id = request.headers.get("x-request-id", "")
+            self._store(
+                handle.profile_id,
+                request_id if REQUEST_ID_PATTERN.match(request_id) else None,
+                label,
+                str(request.url.path),
+                duration,
+                profiler,
+            )
+
+    def _store(
+        self,
+        profile_id: str,
+        request_id: Optional[str],
+        label: str,
+        path: str,
+        duration: float,
+        profiler: cProfile.Profile,
+    ) -> None:
+        profiler.create_stats()
+        entry = {
+            "id": profile_id,
+            "request_id": request_id,
+            "label": label,
+            "path": path,
+            "duration_ms": round(duration * 1000, 2),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "stats": marshal.dumps(profiler.stats),
+        }
+        with self._lock:
+            self._profiles[profile_id] = entry
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        logger.info(f"Stored profile {profile_id} for {label} ({entry['duration_ms']} ms)")
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Return metadata for the retained profiles, newest first."""
+        with self._lock:
+            entries = list(self._profiles.values())
+        return [
+            {key: value for key, value in entry.items() if key != "stats"}
+            for entry in reversed(entries)
+        ]
+
+    def get_stats(self, profile_id: str) -> Optional[bytes]:
+        """Return the raw stats for a profile in the format written by ``pstats.dump_stats``."""
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+        return entry["stats"] if entry else None
+
+    def format_stats(self, profile_id: str, limit: int = 50) -> Optional[str]:
+        """Return a text summary of a profile sorted by cumulative time."""
+        raw = self.get_stats(profile_id)
+        if raw is None:
+            return None
+        stats = pstats.Stats(_RawStats(marshal.loads(raw)), stream=io.StringIO())
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _RawStats:
+    """Adapter letting ``pstats.Stats`` load an already-collected stats dict."""
+
+    def __init__(self, stats: Dict[Any, Any]) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+request_profiler = RequestProfiler()
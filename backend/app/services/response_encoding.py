@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+from typing import Any, Callable, Dict, List, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Bodies smaller than this are sent uncompressed
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+GZIP_LEVEL = 6
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode content as compact JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_msgpack(content: Any) -> bytes:
+    """Encode content as MessagePack."""
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def available_encoders() -> Dict[str, Callable[[Any], bytes]]:
+    """Return the encoders usable in this environment keyed by media type."""
+    encoders: Dict[str, Callable[[Any], bytes]] = {JSON_MEDIA_TYPE: encode_json}
+    if msgpack is not None:
+        for media_type in MSGPACK_MEDIA_TYPES:
+            encoders[media_type] = encode_msgpack
+    return encoders
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    """Parse an Accept header into (media type, quality) pairs, best first."""
+    accepted = []
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type:
+            accepted.append((media_type.strip().lower(), quality))
+    return sorted(accepted, key=lambda item: item[1], reverse=True)
+
+
+def negotiate_media_type(accept: str) -> str:
+    """Pick the response media type for an Accept header, defaulting to JSON."""
+    encoders = available_encoders()
+    for media_type, quality in _parse_accept(accept or ""):
+        if quality <= 0:
+            continue
+        if media_type in encoders:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Check whether an Accept-Encoding header allows a gzip response.
+
+    An explicit ``gzip`` entry takes precedence over the ``*`` wildcard.
+    """
+    qualities = dict(reversed(_parse_accept(accept_encoding or "")))
+    quality = qualities.get("gzip", qualities.get("*", 0.0))
+    return quality > 0
+
+
+def negotiated_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Build a response encoded in the format requested by the client's Accept header.
+
+    Bodies above ``GZIP_MINIMUM_SIZE`` are gzipped when the client accepts it.
+    Content must already be made of plain JSON types, as with ``JSONResponse``.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept", ""))
+    body = available_encoders()[media_type](content)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= GZIP_MINIMUM_SIZE and accepts_gzip(request.headers.get("accept-encoding", "")):
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
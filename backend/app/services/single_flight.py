@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional, Tuple
+from loguru import logger
+
+# Every SingleFlight created, keyed by name, so their counters can be reported together
+single_flights: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution in an executor."""
+
+    def __init__(self, name: str, executor: Optional[Executor] = None) -> None:
+        """Create a named group; ``executor`` defaults to the event loop's thread pool."""
+        self.name = name
+        self.executor = executor
+        self.executed = 0
+        self.coalesced = 0
+        self._calls: Dict[str, asyncio.Future] = {}
+        single_flights[name] = self
+
+    async def do(self, key: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run ``func(*args)`` for ``key``, or wait for the call already in flight for it.
+
+        All callers receive the same result, or the same exception. A caller
+        being cancelled does not cancel the shared call.
+        """
+        result, _ = await self.do_shared(key, func, *args)
+        return result
+
+    async def do_shared(self, key: str, func: Callable[..., Any], *args: Any) -> Tuple[Any, bool]:
+        """Like ``do``, but also report whether this caller joined another caller's call."""
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            logger.debug(f"Coalesced {self.name} call for {key}")
+            return await asyncio.shield(call), True
+
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(self.executor, func, *args)
+        self.executed += 1
+        self._calls[key] = call
+        call.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(call), False
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters for executed, coalesced and currently in-flight calls."""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
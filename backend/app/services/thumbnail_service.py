@@ -0,0 +1,210 @@
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+import fitz  # pymupdf
+from loguru import logger
+from .single_flight import SingleFlight
+
+DEFAULT_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "data/thumbnails")
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+# Least recently used reports are evicted once the cache grows past this size
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+THUMBNAIL_SIZES = (200, 400, 800)
+JPEG_QUALITY = 75
+
+# Page headings EagleView uses for roof diagrams and aerial imagery
+DIAGRAM_PATTERN = re.compile(r'\b(?:diagram|aerial|images?)\b', re.IGNORECASE)
+# Headings only count in this top fraction of the page, so contents pages and footers don't match
+HEADING_REGION = 0.2
+# Share of the page that photos must cover; small logos and icons stay below it
+MIN_IMAGE_COVERAGE = 0.25
+# Vector paths needed for a diagram, with and without a diagram heading; tables use far fewer
+MIN_DIAGRAM_DRAWINGS = 50
+MIN_UNLABELLED_DRAWINGS = 300
+PDF_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write a file so concurrent readers never see it partially written."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _image_coverage(page: "fitz.Page") -> float:
+    """Return the fraction of the page covered by embedded images."""
+    page_area = page.rect.width * page.rect.height
+    covered = 0.0
+    for image in page.get_images(full=True):
+        for rect in page.get_image_rects(image[0]):
+            visible = rect & page.rect
+            covered += visible.width * visible.height
+    return min(covered / page_area, 1.0) if page_area else 0.0
+
+
+def _page_heading(page: "fitz.Page") -> Optional[str]:
+    """Return the diagram heading at the top of the page, if any."""
+    limit = page.rect.y0 + page.rect.height * HEADING_REGION
+    for x0, y0, x1, y1, text, block_no, block_type in page.get_text("blocks"):
+        # Block type 1 is an image placeholder whose text describes the image
+        if block_type == 0 and y0 <= limit:
+            match = DIAGRAM_PATTERN.search(text)
+            if match:
+                return ' '.join(text.split())
+    return None
+
+
+def find_diagram_pages(pdf_path: str, index_path: str) -> List[Dict[str, Any]]:
+    """Find the pages of a report showing photos or roof diagrams and write them to the index."""
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            heading = _page_heading(page)
+            coverage = _image_coverage(page)
+            if coverage >= MIN_IMAGE_COVERAGE:
+                kind = 'image'
+            else:
+                drawings = len(page.get_drawings())
+                needed = MIN_DIAGRAM_DRAWINGS if heading else MIN_UNLABELLED_DRAWINGS
+                if drawings < needed:
+                    continue
+                kind = 'diagram'
+            pages.append({
+                'page': page.number + 1,
+                'kind': kind,
+                'label': heading or kind.title(),
+            })
+    _write_atomic(index_path, json.dumps(pages).encode())
+    return pages
+
+
+def render_thumbnail(pdf_path: str, page_number: int, size: int, output_path: str) -> str:
+    """Render one page as a JPEG whose longest side is ``size`` pixels."""
+    with fitz.open(pdf_path) as doc:
+        if not 1 <= page_number <= doc.page_count:
+            raise ValueError(f"Page must be between 1 and {doc.page_count}")
+        page = doc[page_number - 1]
+        scale = size / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        data = pixmap.tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+
+    _write_atomic(output_path, data)
+    return output_path
+
+
+class ThumbnailService:
+    """Extracts roof diagram pages from reports and caches downscaled thumbnails on disk."""
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        workers: int = THUMBNAIL_WORKERS,
+        max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES,
+    ) -> None:
+        """Initialize the cache directory and the worker pool, which starts processes on first render."""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._flight = SingleFlight("thumbnails", ProcessPoolExecutor(max_workers=workers))
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _report_dir(self, pdf_hash: str) -> str:
+        if not PDF_HASH_PATTERN.match(pdf_hash):
+            raise ValueError("Invalid PDF hash")
+        return os.path.join(self.cache_dir, pdf_hash)
+
+    def _source_path(self, pdf_hash: str) -> str:
+        return os.path.join(self._report_dir(pdf_hash), "source.pdf")
+
+    def store_source(self, pdf_hash: str, pdf_contents: bytes) -> None:
+        """Keep a copy of an uploaded report so its pages can be rendered later."""
+        source_path = self._source_path(pdf_hash)
+        if os.path.exists(source_path):
+            self._touch(pdf_hash)
+            return
+        os.makedirs(os.path.dirname(source_path), exist_ok=True)
+        _write_atomic(source_path, pdf_contents)
+        logger.debug(f"Stored source PDF {pdf_hash} for thumbnails")
+        self._prune(keep=pdf_hash)
+
+    def _touch(self, pdf_hash: str) -> None:
+        """Mark a report as used now, so it is evicted last."""
+        try:
+            os.utime(self._report_dir(pdf_hash))
+        except FileNotFoundError:
+            pass
+
+    def _prune(self, keep: str) -> None:
+        """
+        Evict the least recently used reports until the cache fits in ``max_bytes``.
+
+        A report is used when it is uploaded or when its index or thumbnails are
+        served, which updates the modification time of its directory. Evicted
+        reports answer 404 until the PDF is uploaded again.
+        """
+        reports = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            try:
+                last_used = entry.stat().st_mtime
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            except FileNotFoundError:
+                # Evicted by a concurrent prune
+                continue
+            total += size
+            if entry.name != keep:
+                reports.append((last_used, size, entry.path))
+
+        for last_used, size, path in sorted(reports):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted cached report {os.path.basename(path)} ({size} bytes)")
+
+    def has_source(self, pdf_hash: str) -> bool:
+        """Check whether a report has been uploaded for this hash."""
+        return os.path.exists(self._source_path(pdf_hash))
+
+    async def get_diagram_pages(self, pdf_hash: str) -> List[Dict[str, Any]]:
+        """Return the diagram pages of a report, scanning it only on first request."""
+        index_path = os.path.join(self._report_dir(pdf_hash), "diagrams.json")
+        if os.path.exists(index_path):
+            self._touch(pdf_hash)
+            with open(index_path) as f:
+                return json.load(f)
+
+        if not self.has_source(pdf_hash):
+            raise FileNotFoundError(f"No report stored for {pdf_hash}")
+
+        pages = await self._flight.do(index_path, find_diagram_pages, self._source_path(pdf_hash), index_path)
+        logger.info(f"Found {len(pages)} diagram pages in PDF {pdf_hash}")
+        return pages
+
+    async def get_thumbnail(self, pdf_hash: str, page_number: int, size: int) -> str:
+        """Return the path to a cached page thumbnail, rendering it only on first request."""
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"Size must be one of {THUMBNAIL_SIZES}")
+
+        output_path = os.path.join(self._report_dir(pdf_hash), f"page-{page_number}-{size}.jpg")
+        if os.path.exists(output_path):
+            self._touch(pdf_hash)
+            return output_path
+
+        if not self.has_source(pdf_hash):
+            raise FileNotFoundError(f"No report stored for {pdf_hash}")
+
+        # The worker validates the page number so the PDF is never opened on the event loop
+        await self._flight.do(
+            output_path, render_thumbnail, self._source_path(pdf_hash), page_number, size, output_path
+        )
+        logger.debug(f"Rendered thumbnail for PDF {pdf_hash} page {page_number} at {size}px")
+        return output_path
+
+
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,89 @@
+"""
+Compare response encodings against the plain JSONResponse path.
+
+Run from the backend directory:
+    python -m benchmarks.bench_response_encoding
+"""
+import gzip
+import timeit
+from typing import Any, Callable, Dict
+from fastapi.responses import JSONResponse
+from app.services.response_encoding import encode_json, encode_msgpack, msgpack, orjson
+
+ITERATIONS = 2000
+
+
+def typical_measurements() -> Dict[str, Any]:
+    """A measurement dict shaped like a /api/process-pdf response."""
+    return {
+        'total_area': 3245.0,
+        'predominant_pitch': '6/12',
+        'ridges': 62.0,
+        'valleys': 48.0,
+        'eaves': 180.0,
+        'rakes': 96.0,
+        'hips': 54.0,
+        'flashing': 12.0,
+        'step_flashing': 24.0,
+        'penetrations_area': 6.0,
+        'penetrations_perimeter': 28.0,
+        'waste_percentage': 12,
+        'areas_per_pitch': [
+            {'pitch': '4/12', 'area': 812.5, 'percentage': 25.0},
+            {'pitch': '6/12', 'area': 1947.0, 'percentage': 60.0},
+            {'pitch': '8/12', 'area': 485.5, 'percentage': 15.0},
+        ],
+        'report_id': '45123987',
+        'job_address': '1234 Palm Ave, Tampa, FL 33601',
+        'pdf_hash': 'f' * 64,
+    }
+
+
+def large_payload() -> Dict[str, Any]:
+    """A full page of history results, the largest response the API returns."""
+    return {
+        'items': [
+            {
+                'id': i,
+                'pdf_hash': f'{i:064x}',
+                'filename': f'report-{i}.pdf',
+                'report_id': str(45000000 + i),
+                'job_address': f'{i} Palm Ave, Tampa, FL 33601',
+                'created_at': '2024-01-15T14:03:22.512345+00:00',
+                'measurements': typical_measurements(),
+            }
+            for i in range(100)
+        ],
+        'next_cursor': None,
+    }
+
+
+def json_response_body(content: Any) -> bytes:
+    return JSONResponse(content=content).body
+
+
+def bench(name: str, encoder: Callable[[Any], bytes], content: Any) -> None:
+    body = encoder(content)
+    seconds = timeit.timeit(lambda: encoder(content), number=ITERATIONS)
+    print(
+        f"  {name:<14} {seconds / ITERATIONS * 1e6:9.1f} us/op"
+        f"  {len(body):8d} B  {len(gzip.compress(body)):8d} B gzip"
+    )
+
+
+def main() -> None:
+    encoders = {
+        'JSONResponse': json_response_body,
+        'orjson' if orjson is not None else 'json (compact)': encode_json,
+    }
+    if msgpack is not None:
+        encoders['msgpack'] = encode_msgpack
+
+    for label, content in (('typical', typical_measurements()), ('large', large_payload())):
+        print(f"{label} payload:")
+        for name, encoder in encoders.items():
+            bench(name, encoder, content)
+
+
+if __name__ == "__main__":
+    main()